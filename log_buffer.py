@@ -0,0 +1,32 @@
+"""Buffered logging helper for ZenML pipeline steps."""
+
+import sys
+from typing import List, Optional, TextIO
+
+
+class LogBuffer:
+    """Collect log lines and emit them with a single write on exit."""
+
+    def __init__(self, stream: Optional[TextIO] = None):
+        self._stream = stream
+        self._lines: List[str] = []
+
+    def __call__(self, line: str = "") -> None:
+        """Queue a line for output."""
+        self._lines.append(str(line))
+
+    def __enter__(self) -> "LogBuffer":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.flush()
+
+    def flush(self) -> None:
+        """Write all queued lines at once."""
+        if not self._lines:
+            return
+
+        # Resolve stdout lazily so ZenML's step log capturing sees the output
+        stream = self._stream or sys.stdout
+        stream.write("\n".join(self._lines) + "\n")
+        self._lines.clear()
@@ -1,44 +1,182 @@
 """SQL Executor class for ZenML pipelines."""
 
+import hashlib
 import json
+import os
+import re
+import time
+import msgspec
 from typing import Dict, List, Optional, Any
-from dataclasses import dataclass
-from datetime import datetime
+from datetime import datetime, timezone
+from functools import cached_property, lru_cache
 from zenml.client import Client
 
+try:
+    import keyring
+except ImportError:
+    keyring = None
 
-@dataclass
-class SQLQuery:
+
+SQL_KEYWORDS = [
+    'SELECT', 'FROM', 'WHERE', 'JOIN', 'INNER JOIN', 'LEFT JOIN', 'RIGHT JOIN',
+    'GROUP BY', 'ORDER BY', 'HAVING', 'INSERT', 'UPDATE', 'DELETE', 'CREATE',
+    'ALTER', 'DROP', 'INDEX', 'TABLE', 'VIEW', 'PROCEDURE', 'FUNCTION',
+    'UNION', 'INTERSECT', 'EXCEPT', 'WITH', 'CTE', 'WINDOW', 'OVER',
+    'PARTITION BY', 'ROW_NUMBER', 'RANK', 'DENSE_RANK', 'COUNT', 'SUM',
+    'AVG', 'MIN', 'MAX', 'CASE', 'WHEN', 'THEN', 'ELSE', 'END'
+]
+_SQL_KEYWORD_SET = frozenset(SQL_KEYWORDS)
+
+# Keywords plus "(" in one pass; longer keywords first so "LEFT JOIN" wins over "JOIN"
+_SQL_TOKEN_RE = re.compile(
+    r'\b(?:' + '|'.join(
+        r'\s+'.join(map(re.escape, keyword.split()))
+        for keyword in sorted(SQL_KEYWORDS, key=len, reverse=True)
+    ) + r')\b|\(',
+    re.IGNORECASE
+)
+
+
+@lru_cache(maxsize=1)
+def _client() -> Client:
+    """Return a process-wide ZenML client."""
+    return Client()
+
+
+def format_ms(value: Optional[float]) -> str:
+    """Format a duration in milliseconds for display."""
+    return f"{value:.2f}" if isinstance(value, (int, float)) else "N/A"
+
+
+class _SecretCache:
+    """Resolve ZenML secret values from memory, then the OS keyring, then ZenML.
+    
+    The keyring layer is opt-in via `ZENML_SQL_SECRET_KEYRING=1` and requires
+    the optional `keyring` package.
+    """
+    
+    KEYRING_SERVICE = "zenml_sql_example"
+    # Keyring entry listing every secret name stored by this cache, so that
+    # `clear()` can evict entries written by earlier processes
+    KEYRING_INDEX = "__stored_secret_names__"
+    
+    def __init__(self):
+        self._values: Dict[str, Dict[str, Any]] = {}
+    
+    def __call__(self, name: str) -> Dict[str, Any]:
+        if name not in self._values:
+            values = self._keyring_get(name)
+            if values is None:
+                values = dict(_client().get_secret(name).secret_values)
+                self._keyring_set(name, values)
+            self._values[name] = values
+        # Callers get a copy so they cannot modify the cached values
+        return dict(self._values[name])
+    
+    def clear(self, name: Optional[str] = None) -> None:
+        """Evict one secret (or all of them) from memory and the keyring."""
+        if name is not None:
+            self._values.pop(name, None)
+            self._keyring_delete([name])
+            return
+        
+        self._values.clear()
+        self._keyring_delete(self._keyring_read(self.KEYRING_INDEX) or [])
+        self._keyring_delete([self.KEYRING_INDEX])
+    
+    def _keyring_enabled(self) -> bool:
+        return keyring is not None and os.getenv("ZENML_SQL_SECRET_KEYRING") == "1"
+    
+    def _keyring_read(self, entry: str) -> Optional[Any]:
+        if keyring is None:
+            return None
+        try:
+            stored = keyring.get_password(self.KEYRING_SERVICE, entry)
+            return json.loads(stored) if stored else None
+        except Exception:
+            # Missing backends and corrupted entries fall back to ZenML
+            return None
+    
+    def _keyring_get(self, name: str) -> Optional[Dict[str, Any]]:
+        if not self._keyring_enabled():
+            return None
+        values = self._keyring_read(name)
+        return values if isinstance(values, dict) else None
+    
+    def _keyring_set(self, name: str, values: Dict[str, Any]) -> None:
+        if not self._keyring_enabled():
+            return
+        try:
+            keyring.set_password(self.KEYRING_SERVICE, name, json.dumps(values))
+            stored_names = set(self._keyring_read(self.KEYRING_INDEX) or [])
+            stored_names.add(name)
+            keyring.set_password(self.KEYRING_SERVICE, self.KEYRING_INDEX, json.dumps(sorted(stored_names)))
+        except Exception:
+            pass
+    
+    def _keyring_delete(self, names: List[str]) -> None:
+        # Deletion does not require the opt-in, so disabling the keyring
+        # layer never strands previously stored credentials
+        if keyring is None:
+            return
+        for secret_name in names:
+            try:
+                keyring.delete_password(self.KEYRING_SERVICE, secret_name)
+            except Exception:
+                pass
+        if names and self.KEYRING_INDEX not in names:
+            stored_names = set(self._keyring_read(self.KEYRING_INDEX) or []) - set(names)
+            try:
+                keyring.set_password(self.KEYRING_SERVICE, self.KEYRING_INDEX, json.dumps(sorted(stored_names)))
+            except Exception:
+                pass
+
+
+resolve_secret = _SecretCache()
+
+
+class SQLQuery(msgspec.Struct, dict=True):
     """A SQL query with metadata and execution context."""
     
     query: str
     name: Optional[str] = None
     description: Optional[str] = None
     parameters: Optional[Dict[str, Any]] = None
-    created_at: Optional[datetime] = None
+    created_at: Optional[int] = None  # Nanoseconds since the epoch (UTC)
     
     def __post_init__(self):
         if self.created_at is None:
-            self.created_at = datetime.utcnow()
+            self.created_at = time.time_ns()
         if self.name is None:
-            self.name = f"query_{self.created_at.strftime('%Y%m%d_%H%M%S')}"
+            self.name = f"query_{self.created_at_datetime.strftime('%Y%m%d_%H%M%S')}"
+    
+    @property
+    def created_at_datetime(self) -> Optional[datetime]:
+        """Creation time as a timezone-aware UTC datetime."""
+        if self.created_at is None:
+            return None
+        return datetime.fromtimestamp(self.created_at / 1e9, tz=timezone.utc)
+    
+    @property
+    def created_at_iso(self) -> Optional[str]:
+        """Creation time formatted as ISO 8601, computed on demand."""
+        created_at = self.created_at_datetime
+        return created_at.isoformat() if created_at else None
     
     def to_dict(self) -> Dict[str, Any]:
         """Convert to dictionary for serialization."""
-        return {
-            "query": self.query,
-            "name": self.name,
-            "description": self.description,
-            "parameters": self.parameters,
-            "created_at": self.created_at.isoformat() if self.created_at else None
-        }
+        return msgspec.structs.asdict(self)
     
     @classmethod
     def from_dict(cls, data: Dict[str, Any]) -> "SQLQuery":
         """Create from dictionary."""
-        created_at = None
-        if data.get("created_at"):
-            created_at = datetime.fromisoformat(data["created_at"])
+        created_at = data.get("created_at")
+        if isinstance(created_at, str):
+            # Artifacts saved before the switch to nanoseconds store naive UTC ISO strings
+            parsed = datetime.fromisoformat(created_at)
+            if parsed.tzinfo is None:
+                parsed = parsed.replace(tzinfo=timezone.utc)
+            created_at = round(parsed.timestamp() * 1_000_000) * 1_000
         
         return cls(
             query=data["query"],
@@ -55,35 +193,66 @@ class SQLQuery:
         else:
             return self._real_execute()
     
+    @cached_property
+    def stable_hash(self) -> str:
+        """Digest of the query text that is stable across processes, unlike `hash()`."""
+        return hashlib.blake2b(self.query.encode("utf-8"), digest_size=8).hexdigest()
+    
+    @cached_property
+    def sql_tokens(self) -> frozenset:
+        """SQL keywords (and "(") found in the query, from a single scan.
+        
+        Shared by keyword metadata and complexity analysis so the query text
+        is only scanned once per instance.
+        """
+        tokens = set()
+        for match in _SQL_TOKEN_RE.finditer(self.query):
+            token = " ".join(match.group(0).upper().split())
+            tokens.add(token)
+            # Multi-word matches also count their listed parts (e.g. LEFT JOIN -> JOIN)
+            tokens.update(word for word in token.split() if word in _SQL_KEYWORD_SET)
+        return frozenset(tokens)
+    
+    @property
+    def sql_keywords(self) -> List[str]:
+        """SQL keywords in the query, in `SQL_KEYWORDS` order."""
+        return [keyword for keyword in SQL_KEYWORDS if keyword in self.sql_tokens]
+    
+    @cached_property
+    def cached_result(self) -> Dict[str, Any]:
+        """Mock execution result, computed once and shared by all visualizations."""
+        return self.execute(mock=True)
+    
     def _mock_execute(self) -> Dict[str, Any]:
         """Mock SQL execution for demonstration."""
-        return {
+        start_time = time.monotonic_ns()
+        result = {
             "status": "success",
             "rows_affected": 42,
-            "execution_time_ms": 150,
             "result_preview": [
                 {"id": 1, "name": "John Doe", "email": "john@example.com"},
                 {"id": 2, "name": "Jane Smith", "email": "jane@example.com"},
                 {"id": 3, "name": "Bob Johnson", "email": "bob@example.com"}
             ],
             "metadata": {
-                "query_hash": hash(self.query),
-                "executed_at": datetime.utcnow().isoformat()
+                "query_hash": self.stable_hash,
+                "executed_at": time.time_ns()
             }
         }
+        result["execution_time_ms"] = (time.monotonic_ns() - start_time) / 1e6
+        return result
     
     def _real_execute(self) -> Dict[str, Any]:
         """Real SQL execution using BigQuery secrets."""
         try:
             # Fetch BigQuery credentials from ZenML secrets
-            client = Client()
-            bq_secret = client.get_secret("bigquery_credentials")
+            bq_secret_values = resolve_secret("bigquery_credentials")
             
             # Mock BigQuery connection setup
             credentials = {
-                "project_id": bq_secret.secret_values.get("project_id"),
-                "private_key": bq_secret.secret_values.get("private_key"),
-                "client_email": bq_secret.secret_values.get("client_email")
+                "project_id": bq_secret_values.get("project_id"),
+                "private_key": bq_secret_values.get("private_key"),
+                "client_email": bq_secret_values.get("client_email")
             }
             
             return {
@@ -101,7 +270,7 @@ class SQLQuery:
     
     def to_html(self) -> str:
         """Generate HTML visualization of the query."""
-        execution_result = self.execute(mock=True)
+        execution_result = self.cached_result
         
         html = f"""
         <div style="font-family: Arial, sans-serif; max-width: 800px; margin: 0 auto;">
@@ -118,15 +287,15 @@ class SQLQuery:
                 <h3 style="color: #2d5a2d; margin-top: 0;">Execution Results</h3>
                 <p><strong>Status:</strong> {execution_result['status']}</p>
                 <p><strong>Rows Affected:</strong> {execution_result.get('rows_affected', 'N/A')}</p>
-                <p><strong>Execution Time:</strong> {execution_result.get('execution_time_ms', 'N/A')} ms</p>
+                <p><strong>Execution Time:</strong> {format_ms(execution_result.get('execution_time_ms'))} ms</p>
                 
                 {self._format_result_table(execution_result.get('result_preview', []))}
             </div>
             
             <div style="background: #f0f8ff; padding: 15px; border-radius: 5px; margin: 10px 0;">
                 <h3 style="color: #1e3a8a; margin-top: 0;">Metadata</h3>
-                <p><strong>Created At:</strong> {self.created_at}</p>
-                <p><strong>Query Hash:</strong> {hash(self.query)}</p>
+                <p><strong>Created At:</strong> {self.created_at_iso}</p>
+                <p><strong>Query Hash:</strong> {self.stable_hash}</p>
                 {f'<p><strong>Parameters:</strong> {json.dumps(self.parameters, indent=2)}</p>' if self.parameters else ''}
             </div>
         </div>
@@ -140,17 +309,19 @@ class SQLQuery:
         
         headers = list(results[0].keys())
         
-        table_html = '<table style="width: 100%; border-collapse: collapse; margin: 10px 0;">'
-        table_html += '<thead><tr>'
-        for header in headers:
-            table_html += f'<th style="border: 1px solid #ddd; padding: 8px; background: #f2f2f2;">{header}</th>'
-        table_html += '</tr></thead><tbody>'
-        
-        for row in results:
-            table_html += '<tr>'
-            for header in headers:
-                table_html += f'<td style="border: 1px solid #ddd; padding: 8px;">{row.get(header, "")}</td>'
-            table_html += '</tr>'
+        header_html = "".join(
+            f'<th style="border: 1px solid #ddd; padding: 8px; background: #f2f2f2;">{header}</th>'
+            for header in headers
+        )
+        rows_html = "".join(
+            "<tr>" + "".join(
+                f'<td style="border: 1px solid #ddd; padding: 8px;">{row.get(header, "")}</td>'
+                for header in headers
+            ) + "</tr>"
+            for row in results
+        )
         
-        table_html += '</tbody></table>'
-        return table_html
\ No newline at end of file
+        return (
+            '<table style="width: 100%; border-collapse: collapse; margin: 10px 0;">'
+            f'<thead><tr>{header_html}</tr></thead><tbody>{rows_html}</tbody></table>'
+        )
\ No newline at end of file
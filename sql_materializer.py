@@ -1,12 +1,16 @@
 """Custom materializer for SQL queries in ZenML pipelines."""
 
+import io
 import os
+import csv
 import json
-from typing import Type, Any, Dict
+import msgspec
+from concurrent.futures import ThreadPoolExecutor
+from typing import Type, Any, Dict, Tuple
 from zenml.materializers.base_materializer import BaseMaterializer
 from zenml.enums import ArtifactType, VisualizationType
 from zenml.metadata.metadata_types import MetadataType
-from sql_executor import SQLQuery
+from sql_executor import SQLQuery, format_ms
 
 
 class SQLQueryMaterializer(BaseMaterializer):
@@ -19,63 +23,74 @@ class SQLQueryMaterializer(BaseMaterializer):
         """Load SQLQuery from storage."""
         filepath = os.path.join(self.uri, "sql_query.json")
         
-        with self.artifact_store.open(filepath, "r") as f:
-            data = json.load(f)
+        with self.artifact_store.open(filepath, "rb") as f:
+            payload = f.read()
         
-        return SQLQuery.from_dict(data)
+        try:
+            return msgspec.json.decode(payload, type=SQLQuery)
+        except msgspec.ValidationError:
+            # Artifacts saved before the nanosecond timestamps need conversion
+            return SQLQuery.from_dict(msgspec.json.decode(payload))
     
     def save(self, data: SQLQuery) -> None:
         """Save SQLQuery to storage."""
         filepath = os.path.join(self.uri, "sql_query.json")
         
-        with self.artifact_store.open(filepath, "w") as f:
-            json.dump(data.to_dict(), f, indent=2)
+        # Compact JSON: this payload is only read back by `load`
+        with self.artifact_store.open(filepath, "wb") as f:
+            f.write(msgspec.json.encode(data))
     
     def save_visualizations(self, data: SQLQuery) -> Dict[str, VisualizationType]:
         """Generate visualizations for the ZenML dashboard."""
-        visualizations = {}
-        
-        # HTML visualization
         html_path = os.path.join(self.uri, "sql_query_visualization.html")
-        with self.artifact_store.open(html_path, "w") as f:
-            f.write(data.to_html())
-        visualizations[html_path] = VisualizationType.HTML
-        
-        # Markdown summary
         markdown_path = os.path.join(self.uri, "sql_query_summary.md")
-        with self.artifact_store.open(markdown_path, "w") as f:
-            f.write(self._generate_markdown_summary(data))
-        visualizations[markdown_path] = VisualizationType.MARKDOWN
-        
-        # CSV with query metadata
         csv_path = os.path.join(self.uri, "query_metadata.csv")
-        with self.artifact_store.open(csv_path, "w") as f:
-            f.write(self._generate_csv_metadata(data))
-        visualizations[csv_path] = VisualizationType.CSV
         
-        return visualizations
+        # HTML visualization, Markdown summary and CSV with query metadata
+        self._write_many({
+            html_path: data.to_html(),
+            markdown_path: self._generate_markdown_summary(data),
+            csv_path: self._generate_csv_metadata(data),
+        })
+        
+        return {
+            html_path: VisualizationType.HTML,
+            markdown_path: VisualizationType.MARKDOWN,
+            csv_path: VisualizationType.CSV,
+        }
+    
+    def _write_many(self, files: Dict[str, str]) -> None:
+        """Write several files to the artifact store concurrently."""
+        def write(item: Tuple[str, str]) -> None:
+            path, content = item
+            with self.artifact_store.open(path, "w") as f:
+                f.write(content)
+        
+        # Overlaps the per-file round trips on remote artifact stores
+        with ThreadPoolExecutor(max_workers=len(files) or 1) as executor:
+            list(executor.map(write, files.items()))
     
     def extract_metadata(self, data: SQLQuery) -> Dict[str, MetadataType]:
         """Extract metadata for tracking and search."""
-        execution_result = data.execute(mock=True)
+        execution_result = data.cached_result
         
         metadata = {
             "query_name": data.name,
             "query_length": len(data.query),
-            "query_hash": str(hash(data.query)),
+            "query_hash": data.stable_hash,
             "has_parameters": bool(data.parameters),
             "parameter_count": len(data.parameters) if data.parameters else 0,
             "execution_status": execution_result.get("status", "unknown"),
             "rows_affected": execution_result.get("rows_affected", 0),
             "execution_time_ms": execution_result.get("execution_time_ms", 0),
-            "created_at": data.created_at.isoformat() if data.created_at else None,
+            "created_at": data.created_at_iso,
         }
         
         if data.description:
             metadata["description"] = data.description
         
         # Extract SQL keywords for searchability
-        sql_keywords = self._extract_sql_keywords(data.query)
+        sql_keywords = data.sql_keywords
         if sql_keywords:
             metadata["sql_keywords"] = ", ".join(sql_keywords)
         
@@ -83,13 +98,13 @@ class SQLQueryMaterializer(BaseMaterializer):
     
     def _generate_markdown_summary(self, data: SQLQuery) -> str:
         """Generate a markdown summary of the SQL query."""
-        execution_result = data.execute(mock=True)
+        execution_result = data.cached_result
         
         markdown = f"""# SQL Query: {data.name}
 
 ## Query Details
 - **Name:** {data.name}
-- **Created:** {data.created_at}
+- **Created:** {data.created_at_iso}
 - **Status:** {execution_result.get('status', 'unknown')}
 
 ## SQL Query
@@ -102,51 +117,35 @@ class SQLQueryMaterializer(BaseMaterializer):
 
 ## Execution Results
 - **Rows Affected:** {execution_result.get('rows_affected', 'N/A')}
-- **Execution Time:** {execution_result.get('execution_time_ms', 'N/A')} ms
+- **Execution Time:** {format_ms(execution_result.get('execution_time_ms'))} ms
 - **Status:** {execution_result.get('status', 'unknown')}
 
 ## Parameters
 {json.dumps(data.parameters, indent=2) if data.parameters else 'No parameters'}
 
 ## Metadata
-- **Query Hash:** {hash(data.query)}
-- **SQL Keywords:** {', '.join(self._extract_sql_keywords(data.query))}
+- **Query Hash:** {data.stable_hash}
+- **SQL Keywords:** {', '.join(data.sql_keywords)}
 """
         return markdown
     
     def _generate_csv_metadata(self, data: SQLQuery) -> str:
         """Generate CSV with query metadata."""
-        execution_result = data.execute(mock=True)
-        
-        csv_content = "attribute,value\\n"
-        csv_content += f"name,{data.name}\\n"
-        csv_content += f"query_length,{len(data.query)}\\n"
-        csv_content += f"query_hash,{hash(data.query)}\\n"
-        csv_content += f"created_at,{data.created_at}\\n"
-        csv_content += f"execution_status,{execution_result.get('status', 'unknown')}\\n"
-        csv_content += f"rows_affected,{execution_result.get('rows_affected', 0)}\\n"
-        csv_content += f"execution_time_ms,{execution_result.get('execution_time_ms', 0)}\\n"
-        csv_content += f"has_parameters,{bool(data.parameters)}\\n"
-        csv_content += f"parameter_count,{len(data.parameters) if data.parameters else 0}\\n"
-        
-        return csv_content
-    
-    def _extract_sql_keywords(self, query: str) -> list:
-        """Extract SQL keywords from the query for metadata."""
-        sql_keywords = [
-            'SELECT', 'FROM', 'WHERE', 'JOIN', 'INNER JOIN', 'LEFT JOIN', 'RIGHT JOIN',
-            'GROUP BY', 'ORDER BY', 'HAVING', 'INSERT', 'UPDATE', 'DELETE', 'CREATE',
-            'ALTER', 'DROP', 'INDEX', 'TABLE', 'VIEW', 'PROCEDURE', 'FUNCTION',
-            'UNION', 'INTERSECT', 'EXCEPT', 'WITH', 'CTE', 'WINDOW', 'OVER',
-            'PARTITION BY', 'ROW_NUMBER', 'RANK', 'DENSE_RANK', 'COUNT', 'SUM',
-            'AVG', 'MIN', 'MAX', 'CASE', 'WHEN', 'THEN', 'ELSE', 'END'
+        execution_result = data.cached_result
+        
+        rows = [
+            ("attribute", "value"),
+            ("name", data.name),
+            ("query_length", len(data.query)),
+            ("query_hash", data.stable_hash),
+            ("created_at", data.created_at_iso),
+            ("execution_status", execution_result.get('status', 'unknown')),
+            ("rows_affected", execution_result.get('rows_affected', 0)),
+            ("execution_time_ms", format_ms(execution_result.get('execution_time_ms', 0))),
+            ("has_parameters", bool(data.parameters)),
+            ("parameter_count", len(data.parameters) if data.parameters else 0),
         ]
         
-        query_upper = query.upper()
-        found_keywords = []
-        
-        for keyword in sql_keywords:
-            if keyword in query_upper:
-                found_keywords.append(keyword)
-        
-        return found_keywords
\ No newline at end of file
+        buffer = io.StringIO()
+        csv.writer(buffer, lineterminator="\n").writerows(rows)
+        return buffer.getvalue()
\ No newline at end of file
@@ -2,10 +2,36 @@
 
 from typing import Annotated
 from zenml import step, pipeline
-from sql_executor import SQLQuery
+from log_buffer import LogBuffer
+from sql_executor import SQLQuery, format_ms
 from sql_materializer import SQLQueryMaterializer
 
 
+# One bit per complexity indicator, in reporting order
+_COMPLEXITY_BITS = {
+    "CTE": 1 << 0,
+    "window_functions": 1 << 1,
+    "subqueries": 1 << 2,
+    "joins": 1 << 3,
+    "aggregations": 1 << 4,
+    "having_clause": 1 << 5,
+}
+# SQL keywords that set each indicator's bit
+_COMPLEXITY_KEYWORD_BITS = {
+    "WITH": _COMPLEXITY_BITS["CTE"],
+    "OVER": _COMPLEXITY_BITS["window_functions"],
+    "JOIN": _COMPLEXITY_BITS["joins"],
+    "COUNT": _COMPLEXITY_BITS["aggregations"],
+    "SUM": _COMPLEXITY_BITS["aggregations"],
+    "AVG": _COMPLEXITY_BITS["aggregations"],
+    "MIN": _COMPLEXITY_BITS["aggregations"],
+    "MAX": _COMPLEXITY_BITS["aggregations"],
+    "HAVING": _COMPLEXITY_BITS["having_clause"],
+}
+# (complexity, performance score) indexed by the number of indicators present
+_COMPLEXITY_TABLE = [("low", 95)] * 2 + [("medium", 85)] * 2 + [("high", 70)] * 3
+
+
 @step(output_materializers=SQLQueryMaterializer)
 def create_sql_query() -> SQLQuery:
     """Create a sample SQL query for demonstration."""
@@ -106,18 +132,19 @@ def create_complex_sql_query() -> SQLQuery:
 def execute_sql_query(query: SQLQuery) -> dict:
     """Execute the SQL query and return results."""
     
-    print(f"Executing query: {query.name}")
-    print(f"Description: {query.description}")
-    print(f"Query length: {len(query.query)} characters")
-    
-    # Execute the query (mocked for demonstration)
-    result = query.execute(mock=True)
-    
-    print(f"Execution completed with status: {result['status']}")
-    print(f"Rows affected: {result.get('rows_affected', 'N/A')}")
-    print(f"Execution time: {result.get('execution_time_ms', 'N/A')} ms")
-    
-    return result
+    with LogBuffer() as log:
+        log(f"Executing query: {query.name}")
+        log(f"Description: {query.description}")
+        log(f"Query length: {len(query.query)} characters")
+        
+        # Execute the query (mocked for demonstration)
+        result = query.execute(mock=True)
+        
+        log(f"Execution completed with status: {result['status']}")
+        log(f"Rows affected: {result.get('rows_affected', 'N/A')}")
+        log(f"Execution time: {format_ms(result.get('execution_time_ms'))} ms")
+        
+        return result
 
 
 @step
@@ -140,35 +167,29 @@ def analyze_query_performance(query: SQLQuery, execution_result: dict) -> dict:
         }
     }
     
-    # Analyze query complexity based on keywords
-    query_upper = query.query.upper()
+    # Reuse the query's single keyword scan (shared with the materializer)
+    tokens = query.sql_tokens
+    mask = 0
+    for token in tokens:
+        mask |= _COMPLEXITY_KEYWORD_BITS.get(token, 0)
+    if {"(", "SELECT"} <= tokens:
+        mask |= _COMPLEXITY_BITS["subqueries"]
+    
     complexity_indicators = {
-        "CTE": "WITH" in query_upper,
-        "window_functions": "OVER" in query_upper,
-        "subqueries": "(" in query.query and "SELECT" in query_upper,
-        "joins": any(join in query_upper for join in ["JOIN", "INNER JOIN", "LEFT JOIN", "RIGHT JOIN"]),
-        "aggregations": any(agg in query_upper for agg in ["COUNT", "SUM", "AVG", "MIN", "MAX"]),
-        "having_clause": "HAVING" in query_upper
+        indicator: bool(mask & bit) for indicator, bit in _COMPLEXITY_BITS.items()
     }
     
-    complexity_score = sum(complexity_indicators.values())
-    
-    if complexity_score >= 4:
-        analysis["query_complexity"] = "high"
-        analysis["performance_score"] = 70
-    elif complexity_score >= 2:
-        analysis["query_complexity"] = "medium"
-        analysis["performance_score"] = 85
-    else:
-        analysis["query_complexity"] = "low"
-        analysis["performance_score"] = 95
+    # Map the number of set indicators straight to (complexity, score)
+    complexity_score = bin(mask).count("1")
+    analysis["query_complexity"], analysis["performance_score"] = _COMPLEXITY_TABLE[complexity_score]
     
     analysis["complexity_indicators"] = complexity_indicators
     
-    print(f"Query complexity analysis for '{query.name}':")
-    print(f"  - Complexity: {analysis['query_complexity']}")
-    print(f"  - Performance Score: {analysis['performance_score']}/100")
-    print(f"  - Complexity Indicators: {complexity_indicators}")
+    with LogBuffer() as log:
+        log(f"Query complexity analysis for '{query.name}':")
+        log(f"  - Complexity: {analysis['query_complexity']}")
+        log(f"  - Performance Score: {analysis['performance_score']}/100")
+        log(f"  - Complexity Indicators: {complexity_indicators}")
     
     return analysis
 